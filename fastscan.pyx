@@ -0,0 +1,154 @@
+# cython: language_level=3
+"""Compiled single-directory scanner for ``find_largest_files``.
+
+Build it in place with ``python setup.py build_ext --inplace``; without the
+extension ``find_largest_files`` falls back to its ``os.scandir`` scanner.
+"""
+
+from libc.errno cimport ENOSYS, errno
+from posix.fcntl cimport AT_SYMLINK_NOFOLLOW, O_CLOEXEC, O_DIRECTORY, O_RDONLY
+from posix.fcntl cimport open as c_open
+from posix.stat cimport S_ISDIR, S_ISLNK, S_ISREG, fstatat, struct_stat
+from posix.unistd cimport close
+
+cdef extern from "<dirent.h>" nogil:
+    ctypedef struct DIR:
+        pass
+
+    cdef struct dirent:
+        unsigned char d_type
+        char d_name[256]
+
+    enum:
+        DT_UNKNOWN
+        DT_DIR
+        DT_REG
+        DT_LNK
+
+    DIR *fdopendir(int fd)
+    dirent *readdir(DIR *dirp)
+    int closedir(DIR *dirp)
+    int dirfd(DIR *dirp)
+
+cdef extern from "<sys/stat.h>" nogil:
+    ctypedef struct statx_t "struct statx":
+        unsigned int stx_mask
+        unsigned short stx_mode
+        unsigned long long stx_size
+
+    enum:
+        STATX_TYPE
+        STATX_SIZE
+
+    int c_statx "statx"(int dirfd, const char *pathname, int flags,
+                        unsigned int mask, statx_t *statxbuf)
+
+
+# Cleared on the first ENOSYS (kernels before 4.11), after which only
+# ``fstatat`` is used
+cdef bint _have_statx = True
+
+
+cdef inline bint _is_dot(const char *name) nogil:
+    return name[0] == b"." and (
+        name[1] == 0 or (name[1] == b"." and name[2] == 0)
+    )
+
+
+cdef int _stat_entry(int dir_fd, const char *name, int flags,
+                     unsigned int *mode, long long *size) noexcept nogil:
+    """Fill in the mode and size of ``name``; return 0, or -1 with errno set.
+
+    Only the type and size are requested from ``statx``, so filesystems that
+    compute other attributes lazily (NFS, CephFS) can skip that work.
+    """
+    global _have_statx
+    cdef statx_t stx
+    cdef struct_stat st
+    if _have_statx:
+        if c_statx(dir_fd, name, flags, STATX_TYPE | STATX_SIZE, &stx) == 0:
+            if stx.stx_mask & (STATX_TYPE | STATX_SIZE) == STATX_TYPE | STATX_SIZE:
+                mode[0] = stx.stx_mode
+                size[0] = stx.stx_size
+                return 0
+        elif errno == ENOSYS:
+            _have_statx = False
+        else:
+            return -1
+    if fstatat(dir_fd, name, &st, flags) != 0:
+        return -1
+    mode[0] = st.st_mode
+    size[0] = st.st_size
+    return 0
+
+
+def scan_dir(bytes dirpath, bint follow_symlinks=False):
+    """Scan a single directory and return its files, subdirectories and error paths.
+
+    Same contract as ``find_largest_files._scan_dir``: entries are read with
+    ``readdir`` and regular files are sized with ``statx`` relative to the
+    directory fd, all without holding the GIL.
+    """
+    cdef list files = []
+    cdef list subdirs = []
+    cdef list errors = []
+    cdef const char *c_dirpath = dirpath
+    cdef int fd
+    cdef int rc
+    cdef int flags
+    cdef DIR *handle
+    cdef dirent *entry
+    cdef unsigned char d_type
+    cdef unsigned int mode
+    cdef long long size
+
+    with nogil:
+        fd = c_open(c_dirpath, O_RDONLY | O_DIRECTORY | O_CLOEXEC)
+        handle = fdopendir(fd) if fd >= 0 else NULL
+    if handle == NULL:
+        if fd >= 0:
+            close(fd)
+        errors.append(dirpath)
+        return files, subdirs, errors
+
+    cdef bytes prefix = dirpath if dirpath.endswith(b"/") else dirpath + b"/"
+    try:
+        while True:
+            with nogil:
+                entry = readdir(handle)
+            if entry == NULL:
+                break
+            if _is_dot(entry.d_name):
+                continue
+            d_type = entry.d_type
+            if d_type == DT_DIR:
+                subdirs.append(prefix + <bytes>entry.d_name)
+                continue
+            if d_type == DT_LNK and not follow_symlinks:
+                continue
+            if d_type != DT_REG and d_type != DT_UNKNOWN and d_type != DT_LNK:
+                # Sockets, devices, ...
+                continue
+            flags = 0 if d_type == DT_LNK else AT_SYMLINK_NOFOLLOW
+            with nogil:
+                rc = _stat_entry(dirfd(handle), entry.d_name, flags, &mode, &size)
+                if rc == 0 and d_type == DT_UNKNOWN and S_ISLNK(mode):
+                    if follow_symlinks:
+                        d_type = DT_LNK
+                        rc = _stat_entry(dirfd(handle), entry.d_name, 0, &mode, &size)
+                    else:
+                        rc = 1
+            if rc == 1:
+                continue
+            path = prefix + <bytes>entry.d_name
+            if rc != 0:
+                # Track files we cannot access, and broken symlinks
+                errors.append(path)
+            elif S_ISREG(mode):
+                files.append((size, path))
+            elif S_ISDIR(mode) and d_type != DT_LNK:
+                # Symlinked directories are never descended
+                subdirs.append(path)
+    finally:
+        closedir(handle)
+    return files, subdirs, errors
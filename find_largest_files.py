@@ -4,43 +4,581 @@
 from __future__ import annotations
 
 import argparse
+import ctypes
+import errno
+import functools
+import gzip
+import heapq
+import itertools
+import operator
+import os
+import pickle
+import queue
+import struct
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Sequence, Tuple
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
+try:
+    import liburing  # type: ignore[import-untyped]
+except ImportError:  # optional: batch statx through io_uring on Linux
+    liburing = None
 
-def find_largest_files(
-    directory: Path, recursive: bool = True
-) -> Tuple[List[Tuple[int, Path]], List[Path]]:
-    """Return ``(size, path)`` tuples for files under ``directory`` sorted by size, and list of error paths."""
-    file_sizes: List[Tuple[int, Path]] = []
-    error_paths: List[Path] = []
-    pattern = directory.rglob("*") if recursive else directory.glob("*")
-    file_count = 0
-    for path in pattern:
-        if path.is_file():
+try:
+    import fastscan  # type: ignore[import-not-found]
+except ImportError:  # optional: compiled scanner built from fastscan.pyx
+    fastscan = None
+
+# Metadata lookups are latency-bound, so use more threads than cores.
+DEFAULT_STAT_THREADS = min(32, (os.cpu_count() or 1) * 4)
+
+ScanResult = Tuple[List[Tuple[int, bytes]], List[bytes], List[bytes]]
+
+# A file held for sorting: its size, the index of its directory in a table of
+# unique directories, and the final path component.
+SortEntry = Tuple[int, int, bytes]
+
+# Progress is reported at most once per interval (seconds); the clock is only
+# read every PROGRESS_CHECK_MASK + 1 files.
+PROGRESS_INTERVAL = 1.0
+PROGRESS_CHECK_MASK = 4095
+
+# Output rows are encoded OUTPUT_CHUNK_ROWS at a time and written once at
+# least OUTPUT_FLUSH_SIZE bytes are pending.
+OUTPUT_CHUNK_ROWS = 1024
+OUTPUT_FLUSH_SIZE = 1 << 16
+
+# Unbounded listings larger than SORT_CHUNK_SIZE entries are sorted in runs
+# spilled to temporary files, pickled RUN_BATCH_SIZE entries at a time.
+SORT_CHUNK_SIZE = 1_000_000
+RUN_BATCH_SIZE = 10_000
+
+# Sorting on the size alone lets list.sort build a flat array of int keys and
+# compare those directly, which is several times faster than comparing tuples.
+_SIZE_KEY = operator.itemgetter(0)
+
+SIZE_UNITS = ("B", "KB", "MB", "GB", "TB", "PB")
+_SIZE_DIVISORS = tuple(1 << (10 * index) for index in range(len(SIZE_UNITS)))
+_LAST_UNIT = len(SIZE_UNITS) - 1
+
+# Only the size and file type are needed, which lets filesystems that compute
+# other attributes lazily (NFS, CephFS) skip that work.
+STATX_TYPE = 0x0001
+STATX_SIZE = 0x0200
+AT_FDCWD = -100
+AT_SYMLINK_NOFOLLOW = 0x100
+
+
+# ``struct statx`` is 256 bytes; stx_mask is a u32 at offset 0 and stx_size a
+# u64 at offset 40.
+STATX_BUF_SIZE = 256
+_STATX_MASK = struct.Struct("=I")
+_STATX_SIZE_FIELD = struct.Struct("=Q")
+_STATX_SIZE_OFFSET = 40
+
+
+def _load_statx() -> Optional[Any]:
+    """Return libc's ``statx`` wrapper, or ``None`` if it is not available."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        statx = ctypes.CDLL(None, use_errno=True).statx
+    except (AttributeError, OSError):
+        # glibc < 2.28 or a libc without the wrapper
+        return None
+    statx.argtypes = [
+        ctypes.c_int,
+        ctypes.c_char_p,
+        ctypes.c_int,
+        ctypes.c_uint,
+        ctypes.c_char_p,
+    ]
+    statx.restype = ctypes.c_int
+    return statx
+
+
+_statx = _load_statx()
+
+# Number of statx requests kept in flight per io_uring submission.
+URING_ENTRIES = 256
+# io_uring only gained the statx opcode in Linux 5.6.
+IORING_OP_STATX = 21
+
+_uring_local = threading.local()
+
+
+class _StatxRing:
+    """Per-thread ``io_uring`` that looks up file sizes in batches of ``statx``."""
+
+    def __init__(self) -> None:
+        ring = liburing.Ring()
+        liburing.io_uring_queue_init(URING_ENTRIES, ring)
+        self.ring = ring
+        if not self._supports_statx():
+            # Every statx would complete with -EINVAL; use the fallbacks
+            raise OSError(errno.EOPNOTSUPP, "io_uring does not support statx")
+
+    def _supports_statx(self) -> bool:
+        try:
+            probe = liburing.io_uring_get_probe_ring(self.ring)
+        except RuntimeError:
+            # Kernels that cannot be probed (before 5.6) also lack statx
+            return False
+        if probe is None:
+            return False
+        try:
+            return bool(liburing.io_uring_opcode_supported(probe, IORING_OP_STATX))
+        finally:
+            liburing.io_uring_free_probe(probe)
+
+    def __del__(self) -> None:
+        if hasattr(self, "ring"):
+            liburing.io_uring_queue_exit(self.ring)
+
+    def sizes(self, dir_fd: int, names: List[str]) -> List[Optional[int]]:
+        """Return the size of each name in ``dir_fd``, or ``None`` where ``statx`` failed.
+
+        Every name must be UTF-8 encodable; see ``_uring_name``.
+        """
+        sizes: List[Optional[int]] = []
+        for start in range(0, len(names), URING_ENTRIES):
+            batch = names[start : start + URING_ENTRIES]
+            buffers = [liburing.Statx() for _ in batch]
+            for name, buf in zip(batch, buffers):
+                sqe = liburing.io_uring_get_sqe(self.ring)
+                liburing.io_uring_prep_statx(
+                    sqe,
+                    buf,
+                    name,
+                    AT_SYMLINK_NOFOLLOW,
+                    STATX_SIZE | STATX_TYPE,
+                    dir_fd,
+                )
+            liburing.io_uring_submit_and_wait(self.ring, len(batch))
+            liburing.io_uring_cq_advance(self.ring, len(batch))
+            # A failed statx leaves its buffer untouched, so the returned mask
+            # tells us which lookups succeeded without inspecting each CQE.
+            sizes.extend(
+                buf.size if buf.mask & STATX_SIZE else None for buf in buffers
+            )
+        return sizes
+
+
+def _statx_ring() -> Optional[_StatxRing]:
+    """Return this thread's io_uring, or ``None`` if io_uring is unavailable."""
+    ring: Optional[_StatxRing]
+    try:
+        ring = _uring_local.ring
+        return ring
+    except AttributeError:
+        ring = None
+    if liburing is not None:
+        try:
+            ring = _StatxRing()
+        except OSError:
+            # io_uring disabled by the kernel or a seccomp policy, or too old
+            # to run statx
+            ring = None
+    _uring_local.ring = ring
+    return ring
+
+
+def _uring_name(name: bytes) -> Optional[str]:
+    """Return ``name`` as the str liburing takes, or ``None`` if it is not valid UTF-8."""
+    try:
+        return name.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+def _statx_sizes(dir_fd: int, names: List[bytes]) -> Optional[List[Optional[int]]]:
+    """Look sizes up one ``statx`` call at a time; ``None`` if the kernel lacks it."""
+    global _statx
+    statx = _statx
+    if statx is None:
+        return None
+    buf = ctypes.create_string_buffer(STATX_BUF_SIZE)
+    sizes: List[Optional[int]] = []
+    for name in names:
+        rc = statx(
+            dir_fd, name, AT_SYMLINK_NOFOLLOW, STATX_SIZE | STATX_TYPE, buf
+        )
+        if rc != 0:
+            if ctypes.get_errno() == errno.ENOSYS:
+                # Kernel older than 4.11; stop trying
+                _statx = None
+                return None
+            sizes.append(None)
+        elif _STATX_MASK.unpack_from(buf)[0] & STATX_SIZE:
+            sizes.append(_STATX_SIZE_FIELD.unpack_from(buf, _STATX_SIZE_OFFSET)[0])
+        else:
+            sizes.append(None)
+    return sizes
+
+
+def _stat_sizes(dir_fd: Optional[int], names: List[bytes]) -> List[Optional[int]]:
+    """Look sizes up without io_uring: with ``statx`` if possible, else ``os.stat``."""
+    sizes = _statx_sizes(AT_FDCWD if dir_fd is None else dir_fd, names)
+    if sizes is not None:
+        return sizes
+    stat_sizes: List[Optional[int]] = []
+    for name in names:
+        try:
+            stat_sizes.append(
+                os.stat(name, dir_fd=dir_fd, follow_symlinks=False).st_size
+            )
+        except OSError:
+            stat_sizes.append(None)
+    return stat_sizes
+
+
+def _file_sizes(dirpath: bytes, names: List[bytes]) -> List[Optional[int]]:
+    """Return the size of each file in ``dirpath``, or ``None`` where it cannot be read.
+
+    Names are looked up relative to a single descriptor for the directory, so
+    the kernel does not resolve the full path again for every file.
+    """
+    if not names:
+        return []
+    try:
+        dir_fd = os.open(dirpath, os.O_RDONLY | os.O_DIRECTORY)
+    except (AttributeError, OSError):
+        dir_fd = None
+    try:
+        if dir_fd is None:
+            names = [os.path.join(dirpath, name) for name in names]
+        ring = _statx_ring()
+        if ring is None:
+            return _stat_sizes(dir_fd, names)
+        uring_names = [_uring_name(name) for name in names]
+        ring_sizes = iter(
+            ring.sizes(
+                AT_FDCWD if dir_fd is None else dir_fd,
+                [name for name in uring_names if name is not None],
+            )
+        )
+        # Names liburing cannot take are looked up separately, without
+        # discarding what the ring already returned
+        stat_sizes = iter(
+            _stat_sizes(
+                dir_fd, [name for name, ok in zip(names, uring_names) if ok is None]
+            )
+        )
+        return [
+            next(stat_sizes) if ok is None else next(ring_sizes) for ok in uring_names
+        ]
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+
+
+def _scan_dir(dirpath: bytes, follow_symlinks: bool = False) -> ScanResult:
+    """Scan a single directory and return its files, subdirectories and error paths.
+
+    ``DirEntry`` caches the file type from the directory read, so only the
+    size lookup costs a ``stat`` call; those are issued together for the whole
+    directory. Symlinks are skipped unless ``follow_symlinks`` is set, in which
+    case links to regular files are listed with their target's size and broken
+    links are reported as errors. Symlinked directories are never descended.
+    """
+    files: List[Tuple[int, bytes]] = []
+    subdirs: List[bytes] = []
+    errors: List[bytes] = []
+    file_paths: List[bytes] = []
+    file_names: List[bytes] = []
+    try:
+        it = os.scandir(dirpath)
+    except OSError:
+        errors.append(dirpath)
+        return files, subdirs, errors
+    with it:
+        for entry in it:
             try:
-                file_sizes.append((path.stat().st_size, path))
-                file_count += 1
-                # Print progress every 1000 files
-                if file_count % 1000 == 0:
-                    print(f"Scanned {file_count} files...", flush=True)
+                if entry.is_symlink():
+                    if follow_symlinks and entry.is_file():
+                        files.append((entry.stat().st_size, entry.path))
+                    elif follow_symlinks and not entry.is_dir():
+                        # Broken link, or one to something we cannot stat
+                        entry.stat()
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    file_paths.append(entry.path)
+                    file_names.append(entry.name)
             except OSError:
                 # Track files we cannot access
-                error_paths.append(path)
-                continue
+                errors.append(entry.path)
+    for path, size in zip(file_paths, _file_sizes(dirpath, file_names)):
+        if size is None:
+            errors.append(path)
+        else:
+            files.append((size, path))
+    return files, subdirs, errors
+
+
+# Prefer the compiled scanner when it has been built.
+_scan_one = fastscan.scan_dir if fastscan is not None else _scan_dir
+
+
+def _scan_root(dirpath: bytes, follow_symlinks: bool = False) -> ScanResult:
+    """Scan the top directory, dropping the ``./`` prefix that scanning ``.`` adds.
+
+    Every path below the root is built from these, so the output matches
+    ``Path.rglob``, which lists ``file`` rather than ``./file``.
+    """
+    files, subdirs, errors = _scan_one(dirpath, follow_symlinks)
+    if dirpath != b".":
+        return files, subdirs, errors
+    return (
+        [(size, path[2:]) for size, path in files],
+        [path[2:] for path in subdirs],
+        [path[2:] if path.startswith(b"./") else path for path in errors],
+    )
+
+
+def _scan(
+    dirpath: bytes,
+    recursive: bool,
+    error_paths: List[bytes],
+    follow_symlinks: bool = False,
+) -> Iterator[Tuple[int, bytes]]:
+    """Yield ``(size, path)`` for files under ``dirpath`` from the calling thread.
+
+    Directories are walked depth-first from an explicit stack rather than by
+    recursion, so deep trees cannot hit the recursion limit.
+    """
+    stack = [dirpath]
+    scan = _scan_root
+    while stack:
+        files, subdirs, errors = scan(stack.pop(), follow_symlinks)
+        scan = _scan_one
+        error_paths.extend(errors)
+        yield from files
+        if recursive:
+            # Reversed so subdirectories are visited in directory order
+            stack.extend(reversed(subdirs))
+
+
+def _scan_threaded(
+    dirpath: bytes,
+    recursive: bool,
+    error_paths: List[bytes],
+    stat_threads: int,
+    follow_symlinks: bool = False,
+) -> Iterator[Tuple[int, bytes]]:
+    """Yield ``(size, path)`` for files under ``dirpath`` using a thread pool.
+
+    Each directory is scanned by a worker thread; ``os.scandir`` and ``stat``
+    release the GIL, so up to ``stat_threads`` metadata requests are in
+    flight at once. Subdirectories are submitted back to the pool as they are
+    discovered and results are collected in the calling thread.
+    """
+    done: "queue.Queue[Future[ScanResult]]" = queue.Queue()
+    pool = ThreadPoolExecutor(max_workers=stat_threads)
+
+    def submit(
+        path: bytes, scan: Callable[[bytes, bool], ScanResult] = _scan_one
+    ) -> None:
+        pool.submit(scan, path, follow_symlinks).add_done_callback(done.put)
+
+    try:
+        submit(dirpath, _scan_root)
+        outstanding = 1
+        while outstanding:
+            files, subdirs, errors = done.get().result()
+            outstanding -= 1
+            error_paths.extend(errors)
+            if recursive:
+                for subdir in subdirs:
+                    submit(subdir)
+                outstanding += len(subdirs)
+            yield from files
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def iter_files(
+    directory: Union[str, Path],
+    error_paths: List[bytes],
+    recursive: bool = True,
+    stat_threads: int = DEFAULT_STAT_THREADS,
+    follow_symlinks: bool = False,
+) -> Iterator[Tuple[int, bytes]]:
+    """Yield ``(size, path)`` for files under ``directory`` in scan order.
+
+    ``directory`` is assumed to be a directory; callers check it once up
+    front. Paths are the raw ``bytes`` returned by the kernel, so filenames are
+    never decoded. Paths that cannot be accessed are appended to
+    ``error_paths``.
+    """
+    # Normalised as pathlib does, so ``./dir`` and ``dir/`` list ``dir/file``
+    root = os.fsencode(Path(directory))
+    if stat_threads > 1:
+        files = _scan_threaded(root, recursive, error_paths, stat_threads, follow_symlinks)
+    else:
+        files = _scan(root, recursive, error_paths, follow_symlinks)
+    # Only force progress lines out when someone is watching them
+    interactive = sys.stdout.isatty()
+    last_report = time.monotonic()
+    file_count = 0
+    for item in files:
+        yield item
+        file_count += 1
+        if not file_count & PROGRESS_CHECK_MASK:
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_INTERVAL:
+                print(f"Scanned {file_count} files...", flush=interactive)
+                last_report = now
     if file_count > 0:
-        print(f"Scanned {file_count} files total. Sorting...", flush=True)
-    file_sizes.sort(key=lambda pair: pair[0], reverse=True)
-    return file_sizes, error_paths
+        print(f"Scanned {file_count} files total.", flush=interactive)
+
+
+def _sink_top_n(
+    files: Iterable[Tuple[int, bytes]], top_n: int
+) -> List[Tuple[int, bytes]]:
+    """Return the ``top_n`` largest files, keeping only a bounded min-heap.
+
+    Files are pushed as they are scanned, so nothing beyond ``top_n`` entries
+    is ever stored and only the final ``top_n`` need sorting.
+    """
+    if top_n <= 0:
+        for _ in files:
+            pass
+        return []
+    # Entries are (size, -position, path). Among equal sizes the root is the
+    # file scanned last, so ties keep scan order just as in ``_sink_all``, and
+    # positions are unique so paths are never compared.
+    files = iter(files)
+    heap = [
+        (size, -position, path)
+        for position, (size, path) in enumerate(itertools.islice(files, top_n))
+    ]
+    heapq.heapify(heap)
+    for position, (size, path) in enumerate(files, top_n):
+        # Most files are smaller than the current N-th largest; skip those
+        # without touching the heap
+        if size > heap[0][0]:
+            heapq.heapreplace(heap, (size, -position, path))
+    heap.sort(reverse=True)
+    return [(size, path) for size, _, path in heap]
 
 
+def _spill_run(chunk: List[SortEntry]) -> IO[bytes]:
+    """Write a sorted chunk to a compressed temporary file and rewind it."""
+    run = tempfile.TemporaryFile()
+    with gzip.GzipFile(fileobj=run, mode="wb", compresslevel=1) as stream:
+        for start in range(0, len(chunk), RUN_BATCH_SIZE):
+            batch = chunk[start : start + RUN_BATCH_SIZE]
+            pickle.dump(batch, stream, protocol=pickle.HIGHEST_PROTOCOL)
+    run.seek(0)
+    return run
+
+
+def _read_run(run: IO[bytes]) -> Iterator[SortEntry]:
+    """Yield the entries of a run written by ``_spill_run``."""
+    with gzip.GzipFile(fileobj=run, mode="rb") as stream:
+        while True:
+            try:
+                batch = pickle.load(stream)
+            except EOFError:
+                return
+            yield from batch
+
+
+def _sink_all(
+    files: Iterable[Tuple[int, bytes]], chunk_size: int = SORT_CHUNK_SIZE
+) -> Iterator[Tuple[int, bytes]]:
+    """Yield every file largest first.
+
+    Up to ``chunk_size`` entries are sorted in memory. Larger scans are split
+    into sorted runs spilled to temporary files and merged back lazily, so
+    memory stays bounded by the chunk size. Files of equal size keep their
+    scan order.
+
+    Paths are held as a directory id and a file name rather than in full, so
+    each directory prefix is stored once however many files it holds; the full
+    path is only rebuilt as each file is yielded.
+    """
+    files = iter(files)
+    dir_ids: Dict[bytes, int] = {}
+    dir_names: List[bytes] = []
+    runs: List[IO[bytes]] = []
+    entries: Iterator[SortEntry]
+    try:
+        while True:
+            chunk: List[SortEntry] = []
+            for size, path in itertools.islice(files, chunk_size):
+                split = path.rfind(b"/") + 1
+                dirname = path[:split]
+                dir_id = dir_ids.get(dirname)
+                if dir_id is None:
+                    dir_id = dir_ids[dirname] = len(dir_names)
+                    dir_names.append(dirname)
+                chunk.append((size, dir_id, path[split:]))
+            chunk.sort(key=_SIZE_KEY, reverse=True)
+            if not runs and len(chunk) < chunk_size:
+                # Everything fit in one chunk
+                entries = iter(chunk)
+                break
+            if chunk:
+                runs.append(_spill_run(chunk))
+            if len(chunk) < chunk_size:
+                entries = heapq.merge(
+                    *[_read_run(run) for run in runs], key=_SIZE_KEY, reverse=True
+                )
+                break
+            # Release the chunk before the next one is read
+            del chunk
+        del dir_ids
+        for size, dir_id, name in entries:
+            yield size, dir_names[dir_id] + name
+    finally:
+        for run in runs:
+            run.close()
+
+
+def find_largest_files(
+    directory: Union[str, Path],
+    recursive: bool = True,
+    stat_threads: int = DEFAULT_STAT_THREADS,
+    top_n: Optional[int] = None,
+    follow_symlinks: bool = False,
+) -> Tuple[List[Tuple[int, bytes]], List[bytes]]:
+    """Return ``(size, path)`` tuples for files under ``directory`` sorted by size, and list of error paths.
+
+    When ``top_n`` is given only the ``top_n`` largest files are kept, using a
+    bounded min-heap instead of sorting every file found.
+    """
+    error_paths: List[bytes] = []
+    files = iter_files(directory, error_paths, recursive, stat_threads, follow_symlinks)
+    if top_n is not None:
+        return _sink_top_n(files, top_n), error_paths
+    return list(_sink_all(files)), error_paths
+
+
+@functools.lru_cache(maxsize=4096)
 def format_size(size: int) -> str:
     """Format file size in human-readable format."""
-    for unit in ["B", "KB", "MB", "GB", "TB"]:
-        if size < 1024.0:
-            return f"{size:.1f}{unit}"
-        size /= 1024.0
-    return f"{size:.1f}PB"
+    # Each unit spans 10 bits, so the bit length picks the unit directly.
+    unit_idx = min(max(size.bit_length() - 1, 0) // 10, _LAST_UNIT)
+    return f"{size / _SIZE_DIVISORS[unit_idx]:.1f}{SIZE_UNITS[unit_idx]}"
 
 
 def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
@@ -54,6 +592,7 @@ Examples:
   %(prog)s -n 10              # Show only top 10 largest files
   %(prog)s --human-readable   # Show sizes in human-readable format
   %(prog)s --no-recursive     # Scan only the directory itself, not subdirectories
+  %(prog)s --stat-threads 64  # Keep more metadata requests in flight (e.g. on NFS)
         """,
         formatter_class=argparse.RawDescriptionHelpFormatter,
     )
@@ -82,6 +621,19 @@ Examples:
         action="store_true",
         help="Only scan the specified directory, not subdirectories (default: recursive)",
     )
+    parser.add_argument(
+        "-L",
+        "--follow-symlinks",
+        action="store_true",
+        help="List symlinks to files with their target's size and report broken links (default: skip symlinks)",
+    )
+    parser.add_argument(
+        "--stat-threads",
+        type=int,
+        default=DEFAULT_STAT_THREADS,
+        metavar="N",
+        help=f"Number of threads used to scan directories (default: {DEFAULT_STAT_THREADS})",
+    )
     parser.add_argument(
         "-o",
         "--output",
@@ -93,123 +645,128 @@ Examples:
     return parser.parse_args(argv)
 
 
-def print_error_report(
-    unicode_errors: List[Tuple[int, Path]],
-    error_paths: List[Path],
-    args: argparse.Namespace,
-) -> None:
+def print_error_report(error_paths: List[bytes]) -> None:
     # Print error report
     print("\n" + "=" * 60)
     print("ERROR REPORT")
     print("=" * 60)
 
-    if error_paths:
-        print(
-            f"\n{len(error_paths)} file(s) could not be accessed (permission denied or other OS error):"
-        )
-        for path in error_paths:
-            try:
-                print(f"  - {path}")
-            except UnicodeEncodeError:
-                path_bytes = str(path).encode("utf-8", errors="surrogateescape")
-                path_safe = path_bytes.decode("utf-8", errors="replace")
-                print(f"  - {path_safe}")
-
-    if unicode_errors:
-        print(
-            f"\n{len(unicode_errors)} file(s) with invalid Unicode characters in filename:"
-        )
-        for size, path in unicode_errors:
-            path_bytes = str(path).encode("utf-8", errors="surrogateescape")
-            path_safe = path_bytes.decode("utf-8", errors="replace")
-            if args.human_readable:
-                size_str = format_size(size)
-                print(f"  - {size_str:>10}\t{path_safe}")
-            else:
-                print(f"  - {size}\t{path_safe}")
-            # Also show the raw representation for debugging
-            print(f"    Raw: {repr(str(path))}")
+    print(
+        f"\n{len(error_paths)} file(s) could not be accessed (permission denied or other OS error):"
+    )
+    for path in error_paths:
+        path_str = os.fsdecode(path)
+        try:
+            print(f"  - {path_str}")
+        except UnicodeEncodeError:
+            path_safe = path.decode("utf-8", errors="replace")
+            print(f"  - {path_safe}")
+
+
+def _write_fd(fd: int, data: bytearray) -> None:
+    """Write all of ``data`` to ``fd``, retrying short writes."""
+    with memoryview(data) as view:
+        written = 0
+        while written < len(view):
+            written += os.write(fd, view[written:])
 
 
 def print_file_sizes(
-    file_sizes: List[Tuple[int, Path]], args: argparse.Namespace
-) -> Tuple[List[Tuple[int, Path]], List[Path]]:
-    unicode_errors: List[Tuple[int, Path]] = []
-    error_paths: List[Path] = []
-    
-    # Determine output file handle
-    output_file = None
+    file_sizes: Iterable[Tuple[int, bytes]], args: argparse.Namespace
+) -> None:
+    # Determine output file descriptor; rows are buffered here, so write to
+    # the fd directly instead of through a BufferedWriter
+    output_fd = None
     if args.output:
         try:
-            output_file = open(args.output, "w", encoding="utf-8")
-        except IOError as e:
+            output_fd = os.open(
+                args.output, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666
+            )
+        except OSError as e:
             print(f"Error: Could not open output file '{args.output}': {e}")
-            return unicode_errors, error_paths
-    
-    def write_line(line: str) -> None:
-        if output_file:
-            output_file.write(line + "\n")
+            return
+    sys.stdout.flush()
+    stdout_buffer = getattr(sys.stdout, "buffer", None)
+    pending = bytearray()
+
+    def flush() -> None:
+        if output_fd is not None:
+            _write_fd(output_fd, pending)
+        elif stdout_buffer is not None:
+            stdout_buffer.write(pending)
         else:
-            print(line)
-    
-    write_line(f"File Size\tPath")
-    for size, path in file_sizes:
-        # Handle paths with invalid Unicode characters
-        try:
-            path_str = str(path)
-        except Exception:
-            path_str = repr(path)
+            # Text streams such as StringIO have no buffer and no encoding
+            encoding = getattr(sys.stdout, "encoding", None) or "utf-8"
+            sys.stdout.write(pending.decode(encoding, errors="replace"))
+        pending.clear()
 
-        try:
-            if args.human_readable:
-                size_str = format_size(size)
-                write_line(f"{size_str:>10}\t{path_str}")
-            else:
-                write_line(f"{size}\t{path_str}")
-        except UnicodeEncodeError:
-            # Track files with Unicode errors
-            unicode_errors.append((size, path))
-            # Use error handling to display problematic filenames
-            path_bytes = str(path).encode("utf-8", errors="surrogateescape")
-            path_safe = path_bytes.decode("utf-8", errors="replace")
-            if args.human_readable:
-                size_str = format_size(size)
-                write_line(f"{size_str:>10}\t{path_safe}")
-            else:
-                write_line(f"{size}\t{path_safe}")
-    
-    if output_file:
-        output_file.close()
+    def format_rows(rows: List[Tuple[int, bytes]]) -> bytes:
+        # Paths are written as the raw bytes the filesystem returned
+        if args.human_readable:
+            return b"".join(
+                [
+                    b"%10s\t%s\n" % (format_size(size).encode(), path)
+                    for size, path in rows
+                ]
+            )
+        return b"".join([b"%d\t%s\n" % row for row in rows])
+
+    # Format rows in blocks and write out whenever enough bytes accumulate
+    pending += b"File Size\tPath\n"
+    file_sizes = iter(file_sizes)
+    try:
+        while True:
+            rows = list(itertools.islice(file_sizes, OUTPUT_CHUNK_ROWS))
+            if not rows:
+                break
+            pending += format_rows(rows)
+            if len(pending) >= OUTPUT_FLUSH_SIZE:
+                flush()
+        flush()
+    finally:
+        if output_fd is not None:
+            os.close(output_fd)
+
+    if output_fd is not None:
         print(f"Results saved to '{args.output}'")
-    
-    return unicode_errors, error_paths
+    elif stdout_buffer is not None:
+        stdout_buffer.flush()
+
 
 def main(argv: Optional[Sequence[str]] = None) -> int:
     """Script entry point."""
     args = parse_args(argv)
-    directory = Path(args.directory)
+    directory = args.directory
 
-    if not directory.is_dir():
+    # The single stat for the root; the scan itself does not re-check it
+    if not os.path.isdir(directory):
         print(f"Error: '{directory}' is not a directory")
         return 1
 
-    file_sizes, error_paths = find_largest_files(
-        directory, recursive=not args.no_recursive
+    error_paths: List[bytes] = []
+    files = iter_files(
+        directory,
+        error_paths,
+        recursive=not args.no_recursive,
+        stat_threads=args.stat_threads,
+        follow_symlinks=args.follow_symlinks,
     )
-
-    # Limit results if requested
     if args.num is not None:
-        file_sizes = file_sizes[: args.num]
+        file_sizes: Iterator[Tuple[int, bytes]] = iter(_sink_top_n(files, args.num))
+    else:
+        file_sizes = _sink_all(files)
 
-    if not file_sizes:
+    largest = next(file_sizes, None)
+    if largest is None:
         print(f"No files found in '{directory}'")
         return 0
+    file_sizes = itertools.chain([largest], file_sizes)
+
+    print_file_sizes(file_sizes, args)
+
+    if error_paths:
+        print_error_report(error_paths)
 
-    unicode_errors, error_paths = print_file_sizes(file_sizes, args)
-    
-    if error_paths or unicode_errors:
-        print_error_report(unicode_errors, error_paths, args)
-    
     return 0
 
 
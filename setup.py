@@ -0,0 +1,33 @@
+"""Build the optional compiled modules: ``python setup.py build_ext --inplace``.
+
+Cython builds the ``fastscan`` scanner and mypy's ``mypyc`` compiles
+``find_largest_files.py`` into a drop-in extension module. Each extension is
+only built when its tool is installed; without either, the pure-Python module
+is installed on its own.
+"""
+
+from typing import Any, List
+
+from setuptools import setup
+
+ext_modules: List[Any] = []
+
+try:
+    from Cython.Build import cythonize
+except ImportError:
+    pass
+else:
+    ext_modules += cythonize(["fastscan.pyx"])
+
+try:
+    from mypyc.build import mypycify
+except ImportError:
+    pass
+else:
+    ext_modules += mypycify(["find_largest_files.py"])
+
+setup(
+    name="nas_scripts",
+    py_modules=["find_largest_files"],
+    ext_modules=ext_modules,
+)
@@ -1,18 +1,24 @@
+import contextlib
+import io
 import os
+import sys
+import threading
 from pathlib import Path
-from typing import List
+from types import FrameType
+from typing import List, Optional
 
 import pytest
 
-from find_largest_files import find_largest_files, main
+import find_largest_files as flf
+from find_largest_files import _sink_all, _sink_top_n, find_largest_files, format_size, main
 
 
 def test_find_largest_files_static_data() -> None:
     data_dir = Path(__file__).parent / "data" / "sample"
-    results = find_largest_files(data_dir)
-    names = [path.name for _, path in results]
-    assert names[0] == "file2.txt"
-    assert "file1.txt" in names and "file3.txt" in names
+    results, _ = find_largest_files(data_dir)
+    names = [os.path.basename(path) for _, path in results]
+    assert names[0] == b"file2.txt"
+    assert b"file1.txt" in names and b"file3.txt" in names
 
 
 def test_find_largest_files_returns_sorted(tmp_path: Path) -> None:
@@ -23,9 +29,62 @@ def test_find_largest_files_returns_sorted(tmp_path: Path) -> None:
     file_c = tmp_path / "c.txt"
     file_c.write_text("c" * 3)
 
-    results = find_largest_files(tmp_path)
-    names: List[str] = [path.name for _, path in results]
-    assert names == ["c.txt", "b.txt", "a.txt"]
+    results, _ = find_largest_files(tmp_path)
+    names: List[bytes] = [os.path.basename(path) for _, path in results]
+    assert names == [b"c.txt", b"b.txt", b"a.txt"]
+
+
+def test_find_largest_files_top_n(tmp_path: Path) -> None:
+    for index in range(10):
+        (tmp_path / f"f{index}").write_text("x" * index)
+
+    results, _ = find_largest_files(tmp_path, top_n=3)
+    assert [size for size, _ in results] == [9, 8, 7]
+
+    results, _ = find_largest_files(tmp_path, top_n=20)
+    assert [size for size, _ in results] == list(range(9, -1, -1))
+
+
+@pytest.mark.parametrize("count", [0, 3, 7, 9, 25])
+def test_sink_all_spills_sorted_runs(count: int) -> None:
+    files = [((index * 7) % 11, b"f%d" % index) for index in range(count)]
+    expected = sorted(files, key=lambda item: item[0], reverse=True)
+    assert list(_sink_all(iter(files), chunk_size=3)) == expected
+
+
+def test_sinks_keep_scan_order_for_equal_sizes() -> None:
+    files = [(1, b"b"), (2, b"z"), (1, b"a"), (2, b"y"), (1, b"c"), (3, b"x")]
+    expected = [(3, b"x"), (2, b"z"), (2, b"y"), (1, b"b"), (1, b"a"), (1, b"c")]
+    assert list(_sink_all(iter(files))) == expected
+    assert list(_sink_all(iter(files), chunk_size=2)) == expected
+    for top_n in range(len(files) + 2):
+        assert _sink_top_n(iter(files), top_n) == expected[:top_n]
+
+
+def test_sink_all_rebuilds_paths() -> None:
+    files = [
+        (index, b"/data/dir%d/file%d" % (index % 3, index)) for index in range(10)
+    ] + [(10, b"/top"), (11, b"relative")]
+    expected = sorted(files, reverse=True)
+    assert list(_sink_all(iter(files))) == expected
+    assert list(_sink_all(iter(files), chunk_size=4)) == expected
+
+
+@pytest.mark.parametrize(
+    "size, expected",
+    [
+        (0, "0.0B"),
+        (1023, "1023.0B"),
+        (1024, "1.0KB"),
+        (1536, "1.5KB"),
+        (1024**2 - 1, "1024.0KB"),
+        (5 * 1024**3, "5.0GB"),
+        (1024**5, "1.0PB"),
+        (2048 * 1024**5, "2048.0PB"),
+    ],
+)
+def test_format_size(size: int, expected: str) -> None:
+    assert format_size(size) == expected
 
 
 def test_main_with_directory(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
@@ -33,13 +92,45 @@ def test_main_with_directory(tmp_path: Path, capsys: pytest.CaptureFixture[str])
     (tmp_path / "small").write_text("x")
 
     exit_code = main([str(tmp_path)])
-    captured = capsys.readouterr().out.strip().splitlines()
+    lines = capsys.readouterr().out.strip().splitlines()
+    captured = lines[lines.index("File Size\tPath") + 1 :]
 
     assert exit_code == 0
     assert captured[0].endswith("big")
     assert captured[1].endswith("small")
 
 
+def test_main_with_text_stdout(tmp_path: Path) -> None:
+    (tmp_path / "big").write_text("x" * 5)
+    with open(os.path.join(os.fsencode(tmp_path), b"bad\xff"), "wb") as handle:
+        handle.write(b"x")
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        exit_code = main([str(tmp_path)])
+    lines = output.getvalue().splitlines()
+    captured = lines[lines.index("File Size\tPath") + 1 :]
+
+    assert exit_code == 0
+    assert captured == [f"5\t{tmp_path / 'big'}", f"1\t{tmp_path}/bad\ufffd"]
+
+
+def test_find_largest_files_relative_paths(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "nested.txt").write_text("x" * 2)
+    (tmp_path / "top.txt").write_text("x")
+    monkeypatch.chdir(tmp_path)
+
+    # Listed like Path.rglob: no "./" prefix, and the root is normalised
+    for stat_threads in (1, 4):
+        results, _ = find_largest_files(".", stat_threads=stat_threads)
+        assert results == [(2, b"sub/nested.txt"), (1, b"top.txt")]
+        results, _ = find_largest_files("./sub/", stat_threads=stat_threads)
+        assert results == [(2, b"sub/nested.txt")]
+
+
 def test_main_with_invalid_path(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
     file_path = tmp_path / "file.txt"
     file_path.write_text("not a directory")
@@ -49,3 +140,179 @@ def test_main_with_invalid_path(tmp_path: Path, capsys: pytest.CaptureFixture[st
 
     assert exit_code == 1
     assert "not a directory" in output
+
+
+def test_find_largest_files_skips_symlinks(tmp_path: Path) -> None:
+    target = tmp_path / "real.txt"
+    target.write_text("x" * 4)
+    (tmp_path / "link.txt").symlink_to(target)
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "nested.txt").write_text("x")
+
+    results, errors = find_largest_files(tmp_path)
+    assert [os.path.basename(path) for _, path in results] == [b"real.txt", b"nested.txt"]
+    assert errors == []
+
+    results, _ = find_largest_files(tmp_path, recursive=False)
+    assert [os.path.basename(path) for _, path in results] == [b"real.txt"]
+
+
+def test_find_largest_files_follow_symlinks(tmp_path: Path) -> None:
+    target = tmp_path / "real.txt"
+    target.write_text("x" * 4)
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "nested.txt").write_text("x")
+    (tmp_path / "link.txt").symlink_to(target)
+    (tmp_path / "dirlink").symlink_to(tmp_path / "sub")
+    (tmp_path / "broken").symlink_to(tmp_path / "missing")
+
+    for stat_threads in (1, 4):
+        results, errors = find_largest_files(
+            tmp_path, stat_threads=stat_threads, follow_symlinks=True
+        )
+        # The link and its target tie on size, so their order is scan order
+        assert [size for size, _ in results] == [4, 4, 1]
+        assert sorted((size, os.path.basename(path)) for size, path in results) == [
+            (1, b"nested.txt"),
+            (4, b"link.txt"),
+            (4, b"real.txt"),
+        ]
+        assert errors == [os.fsencode(tmp_path / "broken")]
+
+
+def test_find_largest_files_threaded_matches_serial(tmp_path: Path) -> None:
+    for depth in range(5):
+        subdir = tmp_path.joinpath(*[f"d{i}" for i in range(depth)])
+        subdir.mkdir(parents=True, exist_ok=True)
+        for index in range(3):
+            (subdir / f"f{depth}_{index}").write_text("x" * (depth * 3 + index))
+
+    serial, _ = find_largest_files(tmp_path, stat_threads=1)
+    threaded, _ = find_largest_files(tmp_path, stat_threads=4)
+    assert sorted(threaded) == sorted(serial)
+    assert [size for size, _ in threaded] == sorted((size for size, _ in serial), reverse=True)
+    assert len(threaded) == 15
+
+
+def test_find_largest_files_deep_tree(tmp_path: Path) -> None:
+    deepest = tmp_path.joinpath(*["d"] * 200)
+    os.makedirs(deepest)
+    (deepest / "leaf.txt").write_text("x" * 2)
+
+    # Leave far less headroom than the tree is deep
+    frame: Optional[FrameType] = sys._getframe()
+    depth = 0
+    while frame is not None:
+        frame, depth = frame.f_back, depth + 1
+    old_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(depth + 50)
+    try:
+        results, errors = find_largest_files(tmp_path, stat_threads=1)
+    finally:
+        sys.setrecursionlimit(old_limit)
+    assert results == [(2, os.fsencode(deepest / "leaf.txt"))]
+    assert errors == []
+
+
+def test_find_largest_files_undecodable_name(tmp_path: Path) -> None:
+    (tmp_path / "plain.txt").write_text("x" * 2)
+    with open(os.path.join(os.fsencode(tmp_path), b"bad\xff.txt"), "wb") as handle:
+        handle.write(b"x" * 3)
+
+    results, errors = find_largest_files(tmp_path, stat_threads=1)
+    assert [size for size, _ in results] == [3, 2]
+    assert results[0][1].endswith(b"bad\xff.txt")
+    assert errors == []
+
+
+def test_statx_ring_requires_statx_opcode(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    liburing = pytest.importorskip("liburing")
+    from find_largest_files import _file_sizes, _statx_ring
+
+    (tmp_path / "a.txt").write_text("x" * 3)
+
+    def no_probe(ring: object) -> None:
+        raise RuntimeError("kernel does not support probing")
+
+    # A fresh thread-local so the ring is created again for this test
+    monkeypatch.setattr("find_largest_files._uring_local", threading.local())
+    monkeypatch.setattr(liburing, "io_uring_get_probe_ring", no_probe)
+    assert _statx_ring() is None
+    assert _file_sizes(os.fsencode(tmp_path), [b"a.txt"]) == [3]
+
+
+def test_main_with_output_file(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    scan_dir = tmp_path / "scan"
+    scan_dir.mkdir()
+    (scan_dir / "big").write_text("x" * 5)
+    with open(os.path.join(os.fsencode(scan_dir), b"bad\xff"), "wb") as handle:
+        handle.write(b"x")
+    output = tmp_path / "out.txt"
+
+    exit_code = main([str(scan_dir), "-o", str(output)])
+    report = capsys.readouterr().out
+
+    assert exit_code == 0
+    # Filenames are written as the raw bytes, even when not valid UTF-8
+    lines = output.read_bytes().splitlines()
+    assert lines[0] == b"File Size\tPath"
+    assert lines[1] == b"5\t" + os.fsencode(scan_dir / "big")
+    assert lines[2] == b"1\t" + os.fsencode(scan_dir) + b"/bad\xff"
+    assert "ERROR REPORT" not in report
+
+
+def test_fastscan_matches_scandir(tmp_path: Path) -> None:
+    fastscan = pytest.importorskip("fastscan")
+    from find_largest_files import _scan_dir
+
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.txt").write_text("x" * 3)
+    (tmp_path / "link").symlink_to(tmp_path / "a.txt")
+    with open(os.path.join(os.fsencode(tmp_path), b"bad\xff"), "wb") as handle:
+        handle.write(b"x")
+
+    root = os.fsencode(tmp_path)
+    files, subdirs, errors = fastscan.scan_dir(root)
+    expected_files, expected_subdirs, expected_errors = _scan_dir(root)
+    assert sorted(files) == sorted(expected_files)
+    assert subdirs == expected_subdirs
+    assert errors == expected_errors == []
+
+    (tmp_path / "broken").symlink_to(tmp_path / "missing")
+    files, subdirs, errors = fastscan.scan_dir(root, True)
+    expected = _scan_dir(root, True)
+    assert (sorted(files), subdirs, errors) == (sorted(expected[0]), *expected[1:])
+    assert len(files) == 3 and errors == [root + b"/broken"]
+    assert fastscan.scan_dir(root + b"/missing") == ([], [], [root + b"/missing"])
+
+
+def test_file_size_backends_agree(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    (tmp_path / "a.txt").write_text("x" * 3)
+    names = [b"a.txt", b"missing"]
+    expected = [3, None]
+
+    assert flf._file_sizes(os.fsencode(tmp_path), names) == expected
+    if flf._statx is not None:
+        dir_fd = os.open(tmp_path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            assert flf._statx_sizes(dir_fd, names) == expected
+        finally:
+            os.close(dir_fd)
+
+    monkeypatch.setattr(flf, "_statx_ring", lambda: None)
+    monkeypatch.setattr(flf, "_statx", None)
+    assert flf._file_sizes(os.fsencode(tmp_path), names) == expected
+
+
+def test_main_reports_scan_errors(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    (tmp_path / "file.txt").write_text("x")
+    (tmp_path / "broken").symlink_to(tmp_path / "missing")
+
+    assert main([str(tmp_path), "--follow-symlinks"]) == 0
+    output = capsys.readouterr().out
+    assert "1 file(s) could not be accessed" in output
+    assert f"  - {tmp_path / 'broken'}" in output